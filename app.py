@@ -8,13 +8,14 @@ Updated: 2024-09-30
 """
 # Import standard libraries
 import argparse
+import asyncio
+import logging
 import os
-import pdb
 from typing import Dict
 
 # Local custom imports
 from knower.constants import DOI_EXAMPLES, EMAIL
-from knower.AbstractFetcher import AbstractFetcher
+from knower.AbstractFetcher import AbstractFetcher, AsyncAbstractFetcher
 from knower.elsa import run_elsapy_test
 from knower.utilities import (
     SplitLogger, ShowTimeTaken
@@ -23,15 +24,34 @@ from knower.Validators import ArgParser
 
 
 def main():
+    asyncio.run(amain())
+
+
+async def amain():
     # run_elsapy_test()
     _args = get_cli_args()
-    SplitLogger.from_cli_args(_args)  # logger =
+    logger = SplitLogger.from_cli_args(_args)
 
-    abstracts = dict()
-    fetcher = AbstractFetcher(debugging=_args["debugging"])
-    for each_DOI in _args["doi"]:
-        abstracts[each_DOI] = fetcher.fetch(each_DOI)
-    pdb.set_trace()
+    dois = list(dict.fromkeys(_args["doi"]))  # Unique DOIs, still in order
+    if _args["debugging"]:  # Fetch one at a time so pdb sessions don't mix
+        fetcher = AbstractFetcher(debugging=True)
+        fetcher.prefetch(dois)
+        fetch = fetcher.fetch
+        abstracts = {each_DOI: fetch(each_DOI) for each_DOI in dois}
+    else:
+        fetcher = AsyncAbstractFetcher()
+        await fetcher.prefetch(dois)
+        abstracts = dict(zip(dois, await asyncio.gather(
+            *[fetcher.fetch(each_DOI) for each_DOI in dois],
+            return_exceptions=True
+        )))
+        for each_DOI, abstract in abstracts.items():
+            if isinstance(abstract, BaseException):
+                logger.logAtLevel(logging.ERROR, f"Failed to fetch abstract "
+                                  f"for {each_DOI}: {abstract!r}")
+    if _args["debugging"]:
+        import pdb
+        pdb.set_trace()
     print("Done")
 
 
@@ -6,15 +6,24 @@ Created: 2024-08-19
 Updated: 2024-10-21
 """
 # Import standard libraries
-import pdb
+import asyncio
+from collections.abc import Callable
+import functools
+import itertools
+import logging
 import re
 import requests
-from typing import Any, Dict, List, Literal, Mapping, Optional
+from requests.adapters import HTTPAdapter
+from typing import (Any, Dict, Iterable, List, Literal, Mapping, Optional,
+                    TYPE_CHECKING)
+from urllib3.util.retry import Retry
 # import xml.etree.ElementTree as etree
 
 # Import 3rd-party PyPI libraries
-import bibtexparser
-from bibtexparser.bibdatabase import BibDatabase
+if TYPE_CHECKING:  # bibtexparser is imported only when it is needed
+    from bibtexparser.bibdatabase import BibDatabase
+import ijson
+import orjson
 # import crossref_commons.retrieval as crossref_API
 # import crossref_commons.types as crossref_ORM
 
@@ -22,25 +31,35 @@ from bibtexparser.bibdatabase import BibDatabase
 from knower.constants import (
     EMAIL, HDR_USR_AGENT
 )
+from knower.ResponseCache import CACHE_FPATH, ResponseCache
 from knower.utilities import (
-    doi2url, Debuggable, extract_from_json, ShowTimeTaken
+    as_HTTPS_URL, doi2url, Debuggable, log, ShowTimeTaken
 )
 
 # Constants
 ABSTRACTS_FPATH = "example-publication-response.json"
-XML_PREFIXED_TAG = r"(?:\s?\<{1}\/?.+?:{1}.+?\>\s?)+"
-# r"(?:\s?\<{1}.+?\>\s?)+" ?
+# Character classes instead of nested lazy ".+?" quantifiers so that
+# matching cannot backtrack catastrophically on long abstracts
+XML_PREFIXED_TAG = r"(?:\s?<\/?[^>:]+:[^>]+>\s?)+"
+_XML_PREFIXED_TAG_RE = re.compile(XML_PREFIXED_TAG)
 
 
+@functools.lru_cache(maxsize=1024)
 def parse_abstract_from_incomplete_XML_str(abstract_txt: str
                                            ) -> Dict[str, str]:
-    abs_list = [x for x in filter(None, re.split(
-        XML_PREFIXED_TAG, abstract_txt
-    ))]  # re.split(XML_PREFIXED_TAG, abstract_txt)
+    """
+    Results are cached, so callers must copy the returned dict to modify it
+    :param abstract_txt: str, abstract with XML tags like <jats:p> in it
+    :return: Dict[str, str] mapping "full_text" to the whole abstract, and
+             each section heading in it (if any) to that section's text
+    """
+    abs_list = [x for x in _XML_PREFIXED_TAG_RE.split(abstract_txt.strip())
+                if x]
     abs_dict = {"full_text": " ".join(abs_list)}
-    for i in range(len(abs_list) - 1):
-        if abs_list[i + 1].endswith(".") and not abs_list[i].endswith("."):
-            abs_dict[abs_list[i]] = abs_list[i + 1]
+    ends_with = str.endswith  # Local name skips attribute lookups in loop
+    for heading, section in itertools.pairwise(abs_list):
+        if ends_with(section, ".") and not ends_with(heading, "."):
+            abs_dict[heading] = section
     return abs_dict
 
 
@@ -50,16 +69,30 @@ class Downloader(Debuggable):
         self.responses = list()
         self.ses = requests.Session()
 
+        # Keep connections alive across requests to the same hosts, and
+        # retry transient failures with exponential backoff
+        adapter = HTTPAdapter(pool_connections=32, pool_maxsize=32,
+                              max_retries=Retry(
+                                  total=3, backoff_factor=0.5,
+                                  status_forcelist=(429, 500, 502, 503, 504),
+                                  allowed_methods=frozenset({"GET", "HEAD"})
+                              ))
+        self.ses.mount("https://", adapter)
+        self.ses.mount("http://", adapter)
+
     def get(self, url: str | bytes,
             # allow_redirects: bool = True, timeout: int = 10,
             # headers: Mapping[str, str] = {...},
             url_params: Mapping[str, str],
             **kwargs: Any) -> requests.Response:
         try:
-            self.responses.append(self.ses.get(url, params=url_params,
-                                               **kwargs))
+            resp = self.ses.get(url, params=url_params, **kwargs)
             # allow_redirects=allow_redirects, timeout=timeout,
-            return self.responses[-1]
+
+            # Return the local, not self.responses[-1], because other
+            # threads may have appended their own responses in the meantime
+            self.responses.append(resp)
+            return resp
         except requests.RequestException as err:
             self.debug_or_raise(err, locals())
 
@@ -71,11 +104,28 @@ class AbstractFetcher(Downloader):
         "accept-encoding": "gzip, deflate, br, zstd",
         "user-agent": HDR_USR_AGENT
     }
+    BIBTEX_HEADERS: Dict[str, str] = {"accept": "application/x-bibtex"}
+    CROSSREF_BATCH_SIZE = 80  # Crossref allows 100; leave URL length room
 
     def __init__(self, fpath: Optional[str] = ABSTRACTS_FPATH,
-                 debugging: bool = False) -> None:
+                 debugging: bool = False,
+                 cache_path: str = CACHE_FPATH) -> None:
         super().__init__(debugging=debugging)
-        self.doi2resp = self.read_from_file(fpath)  # TODO Move elsewhere?
+        self.ses.headers.update(self.HEADERS)  # Default for every request
+        self.cache = ResponseCache(cache_path)
+
+        # Seed a brand-new cache with the responses saved in the .JSON file
+        if fpath and not len(self.cache):
+            self.import_from_file(fpath)
+
+    @staticmethod
+    def can_revalidate(meta: Mapping[str, Any]) -> bool:
+        """
+        :param meta: Mapping[str, Any] of metadata about a cached response
+        :return: bool, True if the cached response has an ETag or a
+                 Last-Modified value to send in a conditional request
+        """
+        return bool(meta.get("etag") or meta.get("last-modified"))
 
     def download(self, url: str | bytes,
                  # allow_redirects: bool = True, timeout: int = 10,
@@ -87,21 +137,48 @@ class AbstractFetcher(Downloader):
         kwargs.setdefault("allow_redirects", True)
         kwargs.setdefault("timeout", 10)
 
-        # Default headers for REST request; overwrite with any new ones
-        kwargs["headers"] = {**self.HEADERS, **kwargs.get("headers", dict())}
+        # Any headers in kwargs overwrite the session's default self.HEADERS
         return self.get(url, url_params, **kwargs)
 
     def download_crossref(self, doi: str) -> dict | None:  # TODO ?
-        return self.download(doi2url(doi, "crossref")).json()
+        return orjson.loads(self.download(doi2url(doi, "crossref")).content)
+
+    def download_crossref_batch(self, dois: List[str]
+                                ) -> Dict[str, Dict[str, Any]]:
+        """
+        Get many DOIs' Crossref records using one request to /works
+        :param dois: List[str] of at most 100 valid DOIs
+        :return: Dict[str, Dict[str, Any]] mapping each DOI in dois that
+                 Crossref found to a response shaped like download_crossref's
+        """
+        resp = self.download(
+            as_HTTPS_URL("api.crossref.org/v1/works"),
+            url_params={"filter": ",".join(f"doi:{doi}" for doi in dois),
+                        "rows": len(dois), "mailto": EMAIL}
+        )
+        try:
+            assert resp.status_code == 200
+            resp_json = orjson.loads(resp.content)
+            found = {item["DOI"].lower(): {  # DOIs are case-insensitive
+                "status": resp_json["status"], "message-type": "work",
+                "message-version": resp_json["message-version"],
+                "message": item
+            } for item in resp_json["message"]["items"]}
+        except (AssertionError, AttributeError, KeyError, TypeError,
+                orjson.JSONDecodeError) as err:
+            self.debug_or_raise(err, locals())
+            return dict()
+        return {doi: found[doi.lower()] for doi in dois
+                if doi.lower() in found}
 
-    def download_bibtex(self, doi: str) -> BibDatabase:
+    def download_bibtex(self, doi: str) -> "BibDatabase":
         """
         Get citation
         :param doi: str, _description_
         :return: str, _description_
         """
-        resp = self.download(doi2url(doi),
-                             headers={"accept": "application/x-bibtex"})
+        import bibtexparser
+        resp = self.download(doi2url(doi), headers=self.BIBTEX_HEADERS)
         return bibtexparser.loads(resp.text.strip())
 
     def fetch(self, doi: str) -> Dict[str, str]:
@@ -109,27 +186,150 @@ class AbstractFetcher(Downloader):
         _summary_ 
         :param doi: str, _description_
         """
-        resp_json = self.doi2resp.get(doi)
+        resp_json = self.cache.get(doi)
         if not resp_json:
-            resp_json = self.download_crossref(doi)
+            resp_json = self.revalidate_crossref(doi)
         try:
-            abstract_txt = resp_json["message"]["abstract"].strip()
+            abstract_txt = resp_json["message"]["abstract"]
         except (KeyError, TypeError) as err:
             self.debug_or_raise(err, locals())
         try:
-            # TODO add functionality to add newly downloaded abstracts to .JSON file
-            abstract = parse_abstract_from_incomplete_XML_str(abstract_txt)
+            abstract = dict(parse_abstract_from_incomplete_XML_str(
+                abstract_txt
+            ))
             assert abstract
             return abstract
         except AssertionError as err:
             self.debug_or_raise(err, locals())
 
-    def read_from_file(self, fpath: str) -> Dict[str, Any]:
-        try:  # TODO Move this method to a different class?
-            return extract_from_json(fpath)
-        except (OSError, requests.JSONDecodeError) as err:
+    def import_from_file(self, fpath: str, batch_size: int = 1000) -> None:
+        """
+        Stream DOIs and their responses from a .JSON file into the cache
+        without ever loading the whole file into memory
+        :param fpath: str, valid path to a .JSON file mapping DOIs to their
+                      Crossref responses
+        :param batch_size: int, how many responses to save to cache at once
+        """
+        try:
+            with open(fpath, "rb") as infile:
+                doi_resp_pairs = ijson.kvitems(infile, "", use_float=True)
+                while batch := dict(itertools.islice(doi_resp_pairs,
+                                                     batch_size)):
+                    self.cache.update(batch)
+        except (OSError, ijson.JSONError) as err:
             print(f"Failed to read {fpath}")
             self.debug_or_raise(err, locals())
         except (AttributeError, KeyError, ValueError) as err:
             print("Unexpected err")
             self.debug_or_raise(err, locals())
+
+    def prefetch(self, dois: Iterable[str]) -> None:
+        """
+        Download and cache every uncached DOI's Crossref response in batches
+        so that fetch never needs to download them one at a time
+        :param dois: Iterable[str] of valid DOIs
+        """
+        for batch in self.uncached_batches(dois):
+            self.prefetch_batch(batch)
+
+    def prefetch_batch(self, dois: List[str]) -> None:
+        """
+        Download and cache a batch of DOIs' Crossref responses. If that
+        fails, then skip the batch, leaving its DOIs for fetch to download
+        (and report errors for) one at a time.
+        :param dois: List[str] of at most 100 valid DOIs to download and cache
+        """
+        try:
+            self.cache.update(self.download_crossref_batch(dois))
+        except (requests.RequestException, AssertionError, AttributeError,
+                KeyError, TypeError, ValueError) as err:
+            log(f"Skipping batch of {len(dois)} DOIs starting with {dois[0]}"
+                f" after error: {err!r}", level=logging.WARNING)
+
+    def revalidate_crossref(self, doi: str) -> dict | None:
+        """
+        Download and cache doi's Crossref response. If an expired copy is
+        cached, then send a conditional request so that Crossref only
+        re-sends the response if it changed (otherwise HTTP 304, no body).
+        :param doi: str, valid DOI (Digital Object Identifier)
+        :return: dict, doi's current Crossref response
+        """
+        headers = dict()
+        resp_json, meta = self.cache.get_stale(doi) or (None, dict())
+        if meta.get("etag"):
+            headers["if-none-match"] = meta["etag"]
+        if meta.get("last-modified"):
+            headers["if-modified-since"] = meta["last-modified"]
+        resp = self.download(doi2url(doi, "crossref"), headers=headers)
+        try:
+            if resp.status_code == 304:  # Not Modified
+                self.cache.renew(doi)
+                return resp_json
+            assert resp.status_code == 200, \
+                f"HTTP {resp.status_code} getting Crossref response for {doi}"
+            resp_json = orjson.loads(resp.content)
+        except (AssertionError, AttributeError,
+                orjson.JSONDecodeError) as err:
+            self.debug_or_raise(err, locals())
+            return None  # Never cache anything but a successful response
+        self.cache.set(doi, resp_json, **{
+            "etag": resp.headers.get("etag"),
+            "last-modified": resp.headers.get("last-modified")
+        })
+        return resp_json
+
+    def uncached_batches(self, dois: Iterable[str]) -> List[List[str]]:
+        """
+        :param dois: Iterable[str] of valid DOIs
+        :return: List[List[str]] splitting every DOI in dois that is not
+                 cached yet into batches of CROSSREF_BATCH_SIZE or fewer.
+                 Expired DOIs with an ETag or Last-Modified value saved are
+                 left out, so that fetch can revalidate them instead.
+        """
+        uncached = list()
+        for doi in dois:  # Only check cache metadata, not response bodies
+            is_fresh, meta = self.cache.get_freshness(doi)
+            if not is_fresh and not self.can_revalidate(meta):
+                uncached.append(doi)
+        return [uncached[i:i + self.CROSSREF_BATCH_SIZE] for i in
+                range(0, len(uncached), self.CROSSREF_BATCH_SIZE)]
+
+
+class AsyncAbstractFetcher(AbstractFetcher):
+    # Cap on how many Crossref requests are in flight at once, to respect
+    # their rate limits
+    MAX_CONCURRENT = 8
+
+    def __init__(self, fpath: Optional[str] = ABSTRACTS_FPATH,
+                 debugging: bool = False,
+                 cache_path: str = CACHE_FPATH) -> None:
+        super().__init__(fpath=fpath, debugging=debugging,
+                         cache_path=cache_path)
+        self.limit = asyncio.Semaphore(self.MAX_CONCURRENT)
+
+    async def fetch(self, doi: str) -> Dict[str, str]:
+        """
+        Run AbstractFetcher.fetch in a worker thread so that many DOIs'
+        HTTP round-trips can overlap instead of running one after another
+        :param doi: str, valid DOI (Digital Object Identifier)
+        :return: Dict[str, str], the abstract parsed into sections
+        """
+        return await self.run_in_thread(super().fetch, doi)
+
+    async def prefetch(self, dois: Iterable[str]) -> None:
+        """
+        Download and cache every uncached DOI's Crossref response, running
+        all of the batches concurrently
+        :param dois: Iterable[str] of valid DOIs
+        """
+        await asyncio.gather(*[self.run_in_thread(self.prefetch_batch, batch)
+                               for batch in self.uncached_batches(dois)])
+
+    async def run_in_thread(self, call: Callable, *args: Any) -> Any:
+        """
+        :param call: Callable, blocking function to run in a worker thread
+                     once fewer than MAX_CONCURRENT others are running
+        :return: Any, whatever call(*args) returns
+        """
+        async with self.limit:
+            return await asyncio.to_thread(call, *args)
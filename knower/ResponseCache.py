@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+
+"""
+Greg Conan: gregmconan@gmail.com
+Created: 2026-10-15
+Updated: 2026-10-15
+"""
+# Import standard libraries
+import datetime as dt
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+# Import 3rd-party PyPI libraries
+import orjson
+
+# Constants
+CACHE_FPATH = ".knower_cache.db"
+
+
+class ResponseCache:
+    # Columns: DOI, when its response was saved (UNIX time), JSON dict of
+    # metadata about the response, and the JSON response body itself
+    SCHEMA = ("CREATE TABLE IF NOT EXISTS responses (doi TEXT PRIMARY KEY, "
+              "fetched REAL NOT NULL, meta TEXT NOT NULL, body TEXT NOT NULL)")
+
+    def __init__(self, fpath: str = CACHE_FPATH,
+                 expire_after: dt.timedelta = dt.timedelta(days=30)) -> None:
+        """
+        Persistent on-disk store of API responses keyed by DOI, so that
+        repeated runs never re-download the same publication's data
+        :param fpath: str, valid path to the SQLite database file to use
+        :param expire_after: datetime.timedelta, how long a saved response
+                             stays valid before it must be downloaded again
+        """
+        self.expire_after = expire_after.total_seconds()
+        self.lock = threading.Lock()  # Fetchers can run in worker threads
+        self.db = sqlite3.connect(fpath, check_same_thread=False)
+        with self.lock, self.db:
+            self.db.execute(self.SCHEMA)
+
+            # Keep every saved DOI in memory so that lookups of DOIs that
+            # were never saved can skip the database entirely
+            self.dois = {row[0] for row in
+                         self.db.execute("SELECT doi FROM responses")}
+
+    def __len__(self) -> int:
+        return len(self.dois)
+
+    def get(self, doi: str) -> Optional[Dict[str, Any]]:
+        """
+        :param doi: str, valid DOI (Digital Object Identifier)
+        :return: Dict[str, Any], the saved response for doi if it has not
+                 expired yet; otherwise None
+        """
+        if doi not in self.dois:
+            return None
+        with self.lock:
+            row = self.db.execute(
+                "SELECT body FROM responses WHERE doi = ? AND fetched > ?",
+                (doi, time.time() - self.expire_after)
+            ).fetchone()
+        return orjson.loads(row[0]) if row else None
+
+    def get_stale(self, doi: str
+                  ) -> Optional[Tuple[Dict[str, Any], Dict[str, Any]]]:
+        """
+        :param doi: str, valid DOI (Digital Object Identifier)
+        :return: Tuple of the saved response for doi and its metadata (e.g.
+                 "etag" and "last-modified" headers to revalidate it with)
+                 even if the response has expired; None if it was never saved
+        """
+        if doi not in self.dois:
+            return None
+        with self.lock:
+            row = self.db.execute(
+                "SELECT body, meta FROM responses WHERE doi = ?", (doi,)
+            ).fetchone()
+        return (orjson.loads(row[0]), orjson.loads(row[1])) if row else None
+
+    def get_freshness(self, doi: str) -> Tuple[bool, Dict[str, Any]]:
+        """
+        Check a saved response without loading the response itself
+        :param doi: str, valid DOI (Digital Object Identifier)
+        :return: Tuple of whether doi's saved response has not expired yet,
+                 and its metadata; (False, {}) if nothing was saved for doi
+        """
+        if doi not in self.dois:
+            return False, dict()
+        with self.lock:
+            row = self.db.execute(
+                "SELECT fetched, meta FROM responses WHERE doi = ?", (doi,)
+            ).fetchone()
+        if not row:
+            return False, dict()
+        return row[0] > time.time() - self.expire_after, orjson.loads(row[1])
+
+    def get_meta(self, doi: str) -> Dict[str, Any]:
+        """
+        :param doi: str, valid DOI (Digital Object Identifier)
+        :return: Dict[str, Any], the metadata saved about doi's response
+                 (even if it expired), or an empty dict if none was saved
+        """
+        if doi not in self.dois:
+            return dict()
+        with self.lock:
+            row = self.db.execute(
+                "SELECT meta FROM responses WHERE doi = ?", (doi,)
+            ).fetchone()
+        return orjson.loads(row[0]) if row else dict()
+
+    def renew(self, doi: str) -> None:
+        """
+        Restart the expiration timer of doi's saved response, e.g. after the
+        server confirmed that it has not changed
+        :param doi: str, valid DOI (Digital Object Identifier)
+        """
+        with self.lock, self.db:
+            self.db.execute("UPDATE responses SET fetched = ? WHERE doi = ?",
+                            (time.time(), doi))
+
+    def set(self, doi: str, resp: Mapping[str, Any],
+            **meta: Optional[str]) -> None:
+        """
+        :param doi: str, valid DOI (Digital Object Identifier)
+        :param resp: Mapping[str, Any], the API response to save for doi
+        :param meta: Mapping[str, Optional[str]] of any other info to save
+                     about resp, such as its "etag" response header
+        """
+        self.save_rows([(doi, resp, meta)])
+
+    def update(self, doi2resp: Mapping[str, Mapping[str, Any]]) -> None:
+        """
+        Save many responses at once, e.g. to import them from a .JSON file.
+        Any metadata already saved about them (e.g. "etag") is kept.
+        :param doi2resp: Mapping[str, Mapping[str, Any]] of DOIs to responses
+        """
+        self.save_rows([(doi, resp, self.get_meta(doi))
+                        for doi, resp in doi2resp.items()])
+
+    def save_rows(self, rows: list) -> None:
+        """
+        :param rows: List of (DOI, response, metadata dict) tuples to save
+        """
+        now = time.time()
+        rows = [(doi, now, orjson.dumps(
+            {**meta, "message-version": resp.get("message-version")}
+        ), orjson.dumps(resp)) for doi, resp, meta in rows]
+        with self.lock, self.db:
+            self.db.executemany("INSERT OR REPLACE INTO responses "
+                                "VALUES (?, ?, ?, ?)", rows)
+            self.dois.update(row[0] for row in rows)
@@ -9,9 +9,10 @@ Updated: 2024-09-30
 # Import standard libraries
 import argparse
 from collections.abc import Callable
+from functools import cached_property
 import os
-import pdb
-from typing import Any, Optional
+import stat
+from typing import Any
 
 # Local custom imports
 from knower.utilities import wrap_with_params
@@ -24,9 +25,16 @@ class ArgParser(argparse.ArgumentParser):
         Extends argparse.ArgumentParser functions to include default
         values that I tend to re-use. Purely for convenience.
         """
-        self.cwd = os.getcwd()
         super().__init__(*args, **kwargs)
 
+    @cached_property
+    def cwd(self) -> str:
+        """
+        :return: str, the current working directory, only looked up once
+                 something needs it
+        """
+        return os.getcwd()
+
     def add_new_out_dir_arg(self, name: str, default: str | None = None) -> None:
         """
         Specifies argparse.ArgumentParser.add_argument for a valid path to
@@ -55,36 +63,6 @@ class Valid:
     readable: Callable = wrap_with_params(os.access, mode=os.R_OK)
     writable: Callable = wrap_with_params(os.access, mode=os.W_OK)
 
-    @staticmethod
-    def _validate(to_validate: Any, *conditions: Callable,
-                  # conditions: Iterable[Callable] = list(),
-                  err_msg: str = "`{}` is invalid.",
-                  first_ensure: Optional[Callable] = None,
-                  final_format: Optional[Callable] = None) -> Callable:
-        """
-        Parent/base function used by different type validation functions. Raises an
-        argparse.ArgumentTypeError if the input object is somehow invalid.
-        :param to_validate: String to check if it represents a valid object 
-        :param is_real: Function which returns true iff to_validate is real
-        :param make_valid: Function which returns a fully validated object
-        :param err_msg: String to show to user to tell them what is invalid
-        :param prepare: Function to run before validation
-        :return: to_validate, but fully validated
-        """
-        try:
-            if first_ensure:
-                first_ensure(to_validate)
-            '''
-            for prepare in first_ensure:
-                prepare(to_validate)
-            '''
-            for is_valid in conditions:
-                assert is_valid(to_validate)
-            return final_format(to_validate) if final_format else to_validate
-        except (OSError, TypeError, AssertionError, ValueError,
-                argparse.ArgumentTypeError):
-            raise argparse.ArgumentTypeError(err_msg.format(to_validate))
-
     @classmethod
     def output_dir(cls, path: Any) -> str:
         """
@@ -92,10 +70,14 @@ class Valid:
         :param path: String which is a valid (not necessarily real) folder path
         :return: String which is a validated absolute path to real writeable folder
         """
-        return cls._validate(path, os.path.isdir, cls.writable,
-                             err_msg="Cannot create directory at `{}`",
-                             first_ensure=cls.dir_made,  # [cls.dir_made],
-                             final_format=os.path.abspath)
+        try:  # makedirs raises FileExistsError if path is not a directory
+            cls.dir_made(path)
+            assert cls.writable(path)
+            return os.path.abspath(path)
+        except (OSError, TypeError, AssertionError, ValueError):
+            raise argparse.ArgumentTypeError(
+                f"Cannot create directory at `{path}`"
+            )
 
     @classmethod
     def readable_dir(cls, path: Any) -> str:
@@ -103,9 +85,13 @@ class Valid:
         :param path: Parameter to check if it represents a valid directory path
         :return: String representing a valid directory path
         """
-        return cls._validate(path, os.path.isdir, cls.readable,
-                             err_msg="Cannot read directory at `{}`",
-                             final_format=os.path.abspath)
+        try:
+            assert stat.S_ISDIR(os.stat(path).st_mode) and cls.readable(path)
+            return os.path.abspath(path)
+        except (OSError, TypeError, AssertionError, ValueError):
+            raise argparse.ArgumentTypeError(
+                f"Cannot read directory at `{path}`"
+            )
 
     @classmethod
     def readable_file(cls, path: Any) -> str:
@@ -115,9 +101,11 @@ class Valid:
         :param path: Parameter to check if it represents a valid filepath
         :return: String representing a valid filepath
         """
-        return cls._validate(path, cls.readable,
-                             err_msg="Cannot read file at `{}`",
-                             final_format=os.path.abspath)
+        try:
+            assert cls.readable(path)
+            return os.path.abspath(path)
+        except (OSError, TypeError, AssertionError, ValueError):
+            raise argparse.ArgumentTypeError(f"Cannot read file at `{path}`")
 
     @classmethod
     def whole_number(cls, to_validate: Any):
@@ -126,6 +114,11 @@ class Valid:
         :param to_validate: Object to test whether it is a positive integer
         :return: to_validate if it is a positive integer
         """
-        return cls._validate(to_validate, lambda x: int(x) >= 0,
-                             err_msg="{} is not a positive integer",
-                             final_format=int)
+        try:
+            whole_number = int(to_validate)
+            assert whole_number >= 0
+            return whole_number
+        except (TypeError, AssertionError, ValueError):
+            raise argparse.ArgumentTypeError(
+                f"{to_validate} is not a positive integer"
+            )
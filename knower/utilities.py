@@ -9,16 +9,21 @@ Updated: 2024-09-30
 """
 # Import standard libraries
 from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
 import datetime as dt
-import json
+import functools
 import logging
 import os
-import pdb
 import requests
+from requests.adapters import HTTPAdapter
 import sys
+import time
 from typing import Any, Hashable, Iterable, Mapping, Optional
+import urllib.parse
+from urllib3.util.retry import Retry
 
 # Import third-party libraries from PyPI
+import orjson
 
 # Constants
 DOI_2_DOMAIN = {
@@ -29,7 +34,17 @@ DOI_2_DOMAIN = {
     "TANDF": "www.tandfonline.com/doi/abs/{}",
     "WILEY": "onlinelibrary.wiley.com/doi/{}"
 }
+_DOI_FORMATTERS = {domain: template.format
+                   for domain, template in DOI_2_DOMAIN.items()}
 LOGGER_NAME = __name__
+_DEFAULT_LOGGER = logging.getLogger(LOGGER_NAME)
+
+# One shared session, so that download_GET calls to the same host reuse
+# their keep-alive connections instead of reconnecting every time
+_SESSION = requests.Session()
+_SESSION.mount("https://", HTTPAdapter(pool_connections=16, pool_maxsize=64,
+                                       max_retries=Retry(total=3,
+                                                         backoff_factor=0.3)))
 
 
 # NOTE All functions below are in alphabetical order.
@@ -42,25 +57,65 @@ def as_HTTPS_URL(*parts: str, **url_params: Any) -> str:
                        to pass to the API endpoint as parameters
     :return: String, full HTTPS URL path
     """
-    str_params = [f"{k}={v}" for k, v in url_params.items()]
     url = f"https://{'/'.join(parts)}"
-    if str_params:
-        url += "?" + "&".join(str_params)
+    if url_params:  # urlencode also escapes special characters like & or /
+        url += "?" + urllib.parse.urlencode(url_params)
     return url
 
 
+class BufferedFileHandler(logging.FileHandler):
+    def __init__(self, filename: str, buffer_size: int = 65536,
+                 flush_level: int = logging.ERROR, **kwargs: Any) -> None:
+        """
+        FileHandler that buffers log records in memory and writes them to
+        the file in large chunks, instead of making one write per record
+        :param filename: Valid path to text file to write logs into
+        :param buffer_size: Int, how many bytes to buffer before writing
+        :param flush_level: Int, logging level at/above which to write all
+                            buffered records to the file immediately
+        """
+        self.buffer_size = buffer_size
+        self.flush_level = flush_level
+        super().__init__(filename, **kwargs)
+
+    def _open(self):
+        """
+        :return: io.TextIOWrapper, the log file opened with a large buffer
+        """
+        return open(self.baseFilename, self.mode, buffering=self.buffer_size,
+                    encoding=self.encoding, errors=self.errors)
+
+    def emit(self, record: logging.LogRecord) -> None:
+        """
+        Same as logging.StreamHandler.emit, except it only flushes for
+        records at or above self.flush_level; logging.shutdown flushes the
+        rest when the program exits
+        :param record: logging.LogRecord to write to the log file
+        """
+        if self.stream is None:
+            self.stream = self._open()
+        try:
+            self.stream.write(self.format(record) + self.terminator)
+            if record.levelno >= self.flush_level:
+                self.flush()
+        except RecursionError:
+            raise
+        except Exception:
+            self.handleError(record)
+
+
 def debug(an_err: Exception, local_vars: Mapping[str, Any]) -> None:
     """
     :param an_err: Exception (any)
     :param local_vars: Dict[str, Any] mapping variables' names to their
                        values; locals() called from where an_err originated
     """
-    locals().update(local_vars)
     if verbosity_is_at_least(2):
-        logging.getLogger(LOGGER_NAME).exception(an_err)  # .__traceback__)
+        _DEFAULT_LOGGER.exception(an_err)  # .__traceback__)
     if verbosity_is_at_least(1):
-        show_keys_in(locals())  # , logging.getLogger(LOGGER_NAME).info)
-    pdb.set_trace()
+        show_keys_in(local_vars)  # , logging.getLogger(LOGGER_NAME).info)
+    import pdb  # Only load the debugger once something needs debugging
+    pdb.set_trace()  # Inspect the erroring code's variables via local_vars
 
 
 class Debuggable:
@@ -88,6 +143,17 @@ def default_pop(poppable: Any, key: Any = None,
     :param default: Object to return if running .pop() raises an error
     :return: Object popped from poppable.pop(key), if any; otherwise default
     """
+    # Check dicts and lists first, because raising and catching an error
+    # is much slower than checking whether there is anything to pop
+    if isinstance(poppable, dict):
+        if key is not None:
+            return poppable.pop(key, default)
+        return poppable.popitem()[1] if poppable else default
+    if isinstance(poppable, list):
+        if key is None:
+            return poppable.pop() if poppable else default
+        return poppable.pop(key) if -len(poppable) <= key < len(poppable) \
+            else default
     try:
         to_return = poppable.pop() if key is None else poppable.pop(key)
     except (AttributeError, IndexError, KeyError):
@@ -95,13 +161,14 @@ def default_pop(poppable: Any, key: Any = None,
     return to_return
 
 
+@functools.lru_cache(maxsize=4096)
 def doi2url(doi: str, domain: str = "DOI", **kwargs: Any) -> str:
     """
     :param doi: str, valid DOI (Digital Object Identifier)
     :param domain: str, key in the DOI_2_DOMAIN dict, defaults to "DOI"
     :return: str, valid full URL of the specified Digital Object
     """
-    return as_HTTPS_URL(DOI_2_DOMAIN[domain.upper()].format(doi), **kwargs)
+    return as_HTTPS_URL(_DOI_FORMATTERS[domain.upper()](doi), **kwargs)
 
 
 def download_GET(path_URL: str, headers: Mapping[str, Any]) -> Any:
@@ -112,7 +179,7 @@ def download_GET(path_URL: str, headers: Mapping[str, Any]) -> Any:
     :return: Object(s) retrieved from path_URL using HTTP GET request
     """
     # Make the request to the API
-    response = requests.get(path_URL, headers=headers)
+    response = _SESSION.get(path_URL, headers=headers, timeout=(5, 30))
 
     # Check if the request was successful
     try:
@@ -124,13 +191,28 @@ def download_GET(path_URL: str, headers: Mapping[str, Any]) -> Any:
               f"{response.status_code} Error: {response.reason}")
 
 
+def download_GET_batch(path_URLs: Iterable[str], headers: Mapping[str, Any],
+                       max_workers: int = 8) -> list:
+    """
+    Download many files/resources at once, concurrently, over one Session
+    :param path_URLs: Iterable[str] of full URL paths to files to download
+    :param headers: Mapping[str, Any] of header names to their values in
+                    every HTTP GET request to send
+    :param max_workers: Int, the most requests to have in progress at once
+    :return: List of what download_GET returned for each URL, in order
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(lambda url: download_GET(url, headers),
+                                 path_URLs))
+
+
 def extract_from_json(json_path):
     """
     :param json_path: String, a valid path to a real readable .json file
     :return: Dictionary, the contents of the file at json_path
     """
-    with open(json_path, 'r') as infile:
-        return json.load(infile)
+    with open(json_path, 'rb') as infile:
+        return orjson.loads(infile.read())
 
 
 # TODO Replace "print()" calls with "log()" calls after making log calls
@@ -142,7 +224,9 @@ def log(content: str, level: int = logging.INFO,
     :param level: int, the message's importance/urgency/severity level as
                   defined by logging module's 0 (ignore) to 50 (urgent) scale
     """
-    logging.getLogger(logger_name).log(msg=content, level=level)
+    logger = _DEFAULT_LOGGER if logger_name == LOGGER_NAME \
+        else logging.getLogger(logger_name)
+    logger.log(msg=content, level=level)
 
 
 # TODO move to debug_tools?
@@ -154,7 +238,14 @@ def show_keys_in(a_dict: Mapping[str, Any],  # show: Callable = log
     :param log: Function to log/print text, e.g. logger.info or print
     :param what_keys_are: String naming what the keys are
     """
-    log(f"{what_keys_are}: {stringify_list(uniqs_in(a_dict))}", level=level)
+    # Same output as stringify_list(uniqs_in(a_dict)), in fewer passes
+    keys = sorted(k for k in a_dict
+                  if isinstance(k, str) and not k.startswith("_"))
+    if len(keys) > 1:
+        keys_str = "'" + "', '".join(keys) + "'"
+    else:
+        keys_str = keys[0] if keys else ""
+    log(f"{what_keys_are}: {keys_str}", level=level)
 
 
 def stringify_list(a_list: list) -> str:
@@ -163,14 +254,11 @@ def stringify_list(a_list: list) -> str:
     :return: String containing all items in a_list, single-quoted and
              comma-separated if there are multiple
     """
-    result = ""
-    if a_list and isinstance(a_list, list):
-        list_with_str_els = [str(el) for el in a_list]
-        if len(a_list) > 1:
-            result = "'{}'".format("', '".join(list_with_str_els))
-        else:
-            result = list_with_str_els[0]
-    return result
+    if not a_list or not isinstance(a_list, list):
+        return ""
+    if len(a_list) == 1:
+        return str(a_list[0])
+    return "'" + "', '".join(map(str, a_list)) + "'"
 
 
 class ShowTimeTaken:
@@ -195,8 +283,9 @@ class ShowTimeTaken:
         Log the moment that script execution enters the context manager and
         what it is about to do.
         """
-        self.start = dt.datetime.now()
+        self.start = dt.datetime.now()  # Only for showing to the user
         self.show(f"Started {self.doing_what} at {self.start}")
+        self.start_ns = time.perf_counter_ns()  # Monotonic, for timing
         return self
 
     def __exit__(self, exc_type: Optional[type] = None,
@@ -208,13 +297,16 @@ class ShowTimeTaken:
         :param exc_val: Exception value
         :param exc_tb: Exception traceback
         """
-        self.elapsed = dt.datetime.now() - self.start
+        self.elapsed = dt.timedelta(microseconds=(
+            time.perf_counter_ns() - self.start_ns
+        ) / 1000)
         self.show(f"\nTime elapsed {self.doing_what}: {self.elapsed}")
 
 
 class SplitLogger(logging.getLoggerClass()):
     # Container class for message-logger and error-logger ("split" apart)
     FMT = "\n%(levelname)s %(asctime)s: %(message)s"
+    FORMATTER = logging.Formatter(fmt=FMT)  # Shared by every handler
     LVL = dict(OUT={logging.DEBUG, logging.INFO},
                ERR={logging.CRITICAL, logging.ERROR, logging.WARNING})
     NAME = LOGGER_NAME
@@ -231,9 +323,18 @@ class SplitLogger(logging.getLoggerClass()):
         :param err_fpath: Valid path to text file to write error logs into
         """  # TODO stackoverflow.com/a/33163197 ?
         super().__init__(self.NAME, level=verbosity_to_log_level(verbosity))
+
+        # Sub-loggers writing to the same file share one buffered handler,
+        # so that their messages stay in the order they were logged
+        self.file_handlers = dict()
         self.addSubLogger("out", sys.stdout, out)
         self.addSubLogger("err", sys.stderr, err)
 
+        # Map each level to its sub-logger once instead of on every message
+        self.level_to_sub = {level: self.getChild(sub_name)
+                             for sub_name in ("err", "out")
+                             for level in self.LVL[sub_name.upper()]}
+
     @classmethod
     def from_cli_args(cls, cli_args: Mapping[str, Any]) -> "SplitLogger":
         """
@@ -259,25 +360,23 @@ class SplitLogger(logging.getLoggerClass()):
         """
         sublogger = self.getChild(sub_name)
         sublogger.setLevel(self.level)
-        handler = (logging.FileHandler(log_file_path, encoding="utf-8")
-                   if log_file_path else logging.StreamHandler(log_stream))
-        handler.setFormatter(logging.Formatter(fmt=self.FMT))
+        if not log_file_path:
+            handler = logging.StreamHandler(log_stream)
+        elif log_file_path in self.file_handlers:
+            handler = self.file_handlers[log_file_path]
+        else:
+            handler = BufferedFileHandler(log_file_path, encoding="utf-8")
+            self.file_handlers[log_file_path] = handler
+        handler.setFormatter(self.FORMATTER)
         sublogger.addHandler(handler)
 
-    @classmethod
-    def logAtLevel(cls, level: int, msg: str) -> None:
+    def logAtLevel(self, level: int, msg: str) -> None:
         """
         Log a message, using the sub-logger specific to that message's level 
         :param level: logging._levelToName key; level to log the message at
         :param msg: String, the message to log
         """
-        logger = logging.getLogger(cls.NAME)
-        if level in cls.LVL["ERR"]:
-            sub_log_name = "err"
-        elif level in cls.LVL["OUT"]:
-            sub_log_name = "out"
-        sublogger = logger.getChild(sub_log_name)
-        sublogger.log(level, msg)
+        self.level_to_sub[level].log(level, msg)
 
 
 def stringify_dt(moment: dt.datetime) -> str:
@@ -285,8 +384,7 @@ def stringify_dt(moment: dt.datetime) -> str:
     :param moment: datetime, a specific moment
     :return: String, that moment in "YYYY-mm-dd_HH-MM-SS" format
     """
-    return moment.isoformat(sep="_", timespec="seconds"
-                            ).replace(":", "-")  # .strftime("%Y-%m-%d_%H-%M-%S")
+    return moment.strftime("%Y-%m-%d_%H-%M-%S")
 
 
 def uniqs_in(listlike: Iterable[Hashable]) -> list:
@@ -297,11 +395,8 @@ def uniqs_in(listlike: Iterable[Hashable]) -> list:
     :return: List (sorted) of all unique strings in listlike that don't start
              with an underscore
     """
-    uniqs = set([v if not v.startswith("_") else None
-                 for v in listlike]) - {None}
-    uniqs = [x for x in uniqs]
-    uniqs.sort()
-    return uniqs
+    return sorted({v for v in listlike
+                   if isinstance(v, str) and not v.startswith("_")})
 
 
 def utcnow() -> dt.datetime:
@@ -313,6 +408,7 @@ def utcnow() -> dt.datetime:
 
 
 # TODO Maybe move into new "Loggable" class?
+@functools.lru_cache(maxsize=None)
 def verbosity_to_log_level(verbosity: int) -> int:
     """
     :param verbosity: Int, the number of times that the user included the
@@ -345,4 +441,6 @@ def wrap_with_params(call: Callable, *args: Any, **kwargs: Any) -> Callable:
              'kwargs' parameters, so it only accepts one positional parameter
     """
     # TODO Convert to decorator?
-    return lambda x: call(x, *args, **kwargs)
+    if args:  # functools.partial would put args before x, not after
+        return lambda x: call(x, *args, **kwargs)
+    return functools.partial(call, **kwargs)  # No extra Python-level frame
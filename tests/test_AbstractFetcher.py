@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+
+"""
+Greg Conan: gregmconan@gmail.com
+Created: 2026-10-15
+Updated: 2026-10-15
+"""
+# Import standard libraries
+import time
+
+# Import 3rd-party PyPI libraries
+import orjson
+import pytest
+import requests
+
+# Local custom imports
+from knower.AbstractFetcher import AbstractFetcher
+
+DOI = "10.1/example"
+RESP = {"status": "ok", "message-version": "1.0.0",
+        "message": {"DOI": DOI, "abstract": "<jats:p>Text.</jats:p>"}}
+
+
+def make_response(status_code: int, content: bytes = b"",
+                  **headers: str) -> requests.Response:
+    resp = requests.Response()
+    resp.status_code = status_code
+    resp._content = content
+    resp.headers.update(headers)
+    return resp
+
+
+@pytest.fixture
+def fetcher(tmp_path):
+    return AbstractFetcher(fpath=None, cache_path=str(tmp_path / "cache.db"))
+
+
+def stub_session(fetcher: AbstractFetcher, resp: requests.Response) -> list:
+    """
+    Replace fetcher's HTTP GET with one that always returns resp
+    :return: list, every kwargs dict that the stub was called with
+    """
+    calls = list()
+
+    def get(url, **kwargs):
+        calls.append(kwargs)
+        return resp
+
+    fetcher.ses.get = get
+    return calls
+
+
+def expire(fetcher: AbstractFetcher, doi: str) -> None:
+    cache = fetcher.cache
+    with cache.lock, cache.db:
+        cache.db.execute("UPDATE responses SET fetched = ? WHERE doi = ?",
+                         (time.time() - cache.expire_after - 1, doi))
+
+
+def test_200_is_cached_with_validators(fetcher):
+    stub_session(fetcher, make_response(200, orjson.dumps(RESP), ETag="abc"))
+    assert fetcher.revalidate_crossref(DOI) == RESP
+    assert fetcher.cache.get(DOI) == RESP
+    assert fetcher.cache.get_meta(DOI)["etag"] == "abc"
+
+
+def test_304_renews_stale_copy(fetcher):
+    fetcher.cache.set(DOI, RESP, etag="abc")
+    expire(fetcher, DOI)
+    calls = stub_session(fetcher, make_response(304))
+    assert fetcher.revalidate_crossref(DOI) == RESP
+    assert calls[0]["headers"]["if-none-match"] == "abc"
+    assert fetcher.cache.get(DOI) == RESP
+
+
+def test_200_replaces_stale_copy(fetcher):
+    fetcher.cache.set(DOI, RESP, etag="abc")
+    expire(fetcher, DOI)
+    new_resp = {**RESP, "message-version": "2.0.0"}
+    stub_session(fetcher, make_response(200, orjson.dumps(new_resp),
+                                        ETag="def"))
+    assert fetcher.revalidate_crossref(DOI) == new_resp
+    assert fetcher.cache.get(DOI) == new_resp
+    assert fetcher.cache.get_meta(DOI)["etag"] == "def"
+
+
+@pytest.mark.parametrize("resp", [
+    make_response(400, orjson.dumps({"status": "failed", "message-type":
+                                     "validation-failure", "message": []})),
+    make_response(404, b"Resource not found.")
+])
+def test_error_status_is_not_cached(fetcher, resp):
+    stub_session(fetcher, resp)
+    with pytest.raises(AssertionError):
+        fetcher.revalidate_crossref(DOI)
+    assert fetcher.cache.get_stale(DOI) is None
+
+
+def test_undecodable_200_is_not_cached(fetcher):
+    stub_session(fetcher, make_response(200, b"Not JSON"))
+    with pytest.raises(orjson.JSONDecodeError):
+        fetcher.revalidate_crossref(DOI)
+    assert fetcher.cache.get_stale(DOI) is None
+
+
+def test_uncached_batches_skips_fresh_and_revalidatable(fetcher):
+    fetcher.cache.set("10.1/fresh", RESP)
+    fetcher.cache.set("10.1/etag", RESP, etag="abc")
+    fetcher.cache.set("10.1/no-etag", RESP)
+    for doi in ("10.1/etag", "10.1/no-etag"):
+        expire(fetcher, doi)
+    assert fetcher.uncached_batches(["10.1/fresh", "10.1/etag",
+                                     "10.1/no-etag", "10.1/new"]
+                                    ) == [["10.1/no-etag", "10.1/new"]]
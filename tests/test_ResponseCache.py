@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+
+"""
+Greg Conan: gregmconan@gmail.com
+Created: 2026-10-15
+Updated: 2026-10-15
+"""
+# Import standard libraries
+import datetime as dt
+import time
+
+# Local custom imports
+from knower.ResponseCache import ResponseCache
+
+DOI = "10.1/example"
+RESP = {"status": "ok", "message-version": "1.0.0",
+        "message": {"DOI": DOI, "abstract": "<jats:p>Text.</jats:p>"}}
+
+
+def make_expired(cache: ResponseCache, doi: str) -> None:
+    with cache.lock, cache.db:
+        cache.db.execute("UPDATE responses SET fetched = ? WHERE doi = ?",
+                         (time.time() - cache.expire_after - 1, doi))
+
+
+def test_get_returns_saved_response(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.db"))
+    assert cache.get(DOI) is None
+    cache.set(DOI, RESP)
+    assert cache.get(DOI) == RESP
+    assert len(cache) == 1
+
+
+def test_saved_responses_persist(tmp_path):
+    ResponseCache(str(tmp_path / "cache.db")).set(DOI, RESP)
+    cache = ResponseCache(str(tmp_path / "cache.db"))
+    assert DOI in cache.dois
+    assert cache.get(DOI) == RESP
+
+
+def test_expired_response_is_only_stale(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.db"))
+    cache.set(DOI, RESP, etag="abc")
+    make_expired(cache, DOI)
+    assert cache.get(DOI) is None
+    assert cache.get_stale(DOI) == (RESP, {"etag": "abc",
+                                           "message-version": "1.0.0"})
+    assert cache.get_freshness(DOI) == (False, {"etag": "abc",
+                                                "message-version": "1.0.0"})
+
+
+def test_renew_restarts_expiry(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.db"))
+    cache.set(DOI, RESP)
+    make_expired(cache, DOI)
+    cache.renew(DOI)
+    assert cache.get(DOI) == RESP
+    assert cache.get_freshness(DOI)[0]
+
+
+def test_zero_expiry_never_fresh(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.db"), dt.timedelta(0))
+    cache.set(DOI, RESP)
+    assert cache.get(DOI) is None
+    assert cache.get_stale(DOI)[0] == RESP
+
+
+def test_unsaved_doi(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.db"))
+    assert cache.get_stale(DOI) is None
+    assert cache.get_meta(DOI) == dict()
+    assert cache.get_freshness(DOI) == (False, dict())
+
+
+def test_update_keeps_saved_validators(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.db"))
+    cache.set(DOI, RESP, etag="abc", **{"last-modified": "Mon"})
+    new_resp = {**RESP, "message-version": "2.0.0"}
+    cache.update({DOI: new_resp})
+    assert cache.get(DOI) == new_resp
+    assert cache.get_meta(DOI) == {"etag": "abc", "last-modified": "Mon",
+                                   "message-version": "2.0.0"}
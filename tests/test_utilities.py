@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+
+"""
+Greg Conan: gregmconan@gmail.com
+Created: 2026-10-15
+Updated: 2026-10-15
+"""
+# Import standard libraries
+import logging
+
+# Local custom imports
+from knower.utilities import SplitLogger
+
+
+def test_split_logger_file_keeps_message_order(tmp_path):
+    log_file_path = str(tmp_path / "log.txt")
+    logger = SplitLogger(verbosity=3, out=log_file_path, err=log_file_path)
+    levels = [logging.INFO, logging.ERROR] * 3
+    try:
+        for i, level in enumerate(levels):
+            logger.logAtLevel(level, f"message {i}")
+        for handler in logger.file_handlers.values():
+            handler.flush()
+        with open(log_file_path, encoding="utf-8") as infile:
+            logged = [line.split(": ", 1)[1] for line in infile
+                      if ": " in line]
+        assert logged == [f"message {i}\n" for i in range(len(levels))]
+    finally:  # Sub-loggers are global, so don't leave handlers on them
+        for sub_name in ("out", "err"):
+            sublogger = logger.getChild(sub_name)
+            for handler in sublogger.handlers[:]:
+                sublogger.removeHandler(handler)
+                handler.close()